@@ -4,6 +4,8 @@ from queue import Queue
 from typing import Dict
 from typing import List
 from typing import Optional
+from typing import Sequence
+from typing import Set
 from typing import Tuple
 
 from scipy.sparse import csr_matrix
@@ -184,6 +186,14 @@ class HierarchicalStructure(BaseMixin):
         except KeyError:
             raise ValueError(f"Segment {segment} is out of the hierarchy")
 
+    def get_segments_levels(self, segments: Sequence[str]) -> Set[str]:
+        """Get set of level names for provided segments."""
+        try:
+            return {self._segment_to_level[segment] for segment in segments}
+        except KeyError:
+            unknown_segment = next(segment for segment in segments if segment not in self._segment_to_level)
+            raise ValueError(f"Segment {unknown_segment} is out of the hierarchy")
+
     def get_level_depth(self, level_name: str) -> int:
         """Get level depth in a hierarchy tree."""
         try:
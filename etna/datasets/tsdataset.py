@@ -1,11 +1,12 @@
 import math
 import warnings
 from copy import copy
-from copy import deepcopy
+from itertools import chain
 from typing import TYPE_CHECKING
 from typing import Any
 from typing import Callable
 from typing import Dict
+from typing import FrozenSet
 from typing import Iterable
 from typing import Iterator
 from typing import List
@@ -21,6 +22,18 @@ from typing_extensions import Literal
 
 from etna import SETTINGS
 from etna.datasets.hierarchical_structure import HierarchicalStructure
+from etna.datasets.utils import _flatten_categorical
+from etna.datasets.utils import _flatten_numeric_features
+from etna.datasets.utils import _get_features_positions
+from etna.datasets.utils import _get_level_unique_values
+from etna.datasets.utils import _get_valid_timestamps_bounds
+from etna.datasets.utils import _get_valid_values_stats
+from etna.datasets.utils import _make_windows
+from etna.datasets.utils import _select_features
+from etna.datasets.utils import _slice_from_first_valid
+from etna.datasets.utils import _sort_columns
+from etna.datasets.utils import _timestamps_to_datetime
+from etna.datasets.utils import _TorchArraysDataset
 from etna.datasets.utils import _TorchDataset
 from etna.datasets.utils import get_level_dataframe
 from etna.datasets.utils import inverse_transform_target_components
@@ -49,6 +62,9 @@ class TSDataset:
 
     During creation segment is casted to string type.
 
+    ``df_exog`` is treated as immutable: it is shared between the dataset and datasets created from it
+    (e.g. by ``make_future``), so methods of the class replace it instead of changing it inplace.
+
     Examples
     --------
     >>> from etna.datasets import generate_const_df
@@ -104,6 +120,8 @@ class TSDataset:
 
     idx = pd.IndexSlice
 
+    _columns_cache_size = 4
+
     def __init__(
         self,
         df: pd.DataFrame,
@@ -128,13 +146,14 @@ class TSDataset:
         hierarchical_structure:
             Structure of the levels in the hierarchy. If None, there is no hierarchical structure in the dataset.
         """
+        self._columns_cache: Dict[int, Tuple[pd.Index, Dict[str, Any]]] = {}
+
         self.raw_df = self._prepare_df(df)
-        self.raw_df.index = pd.to_datetime(self.raw_df.index)
+        if not isinstance(self.raw_df.index, pd.DatetimeIndex):
+            self.raw_df.index = pd.to_datetime(self.raw_df.index)
         self.freq = freq
         self.df_exog = None
 
-        self.raw_df.index = pd.to_datetime(self.raw_df.index)
-
         try:
             inferred_freq = pd.infer_freq(self.raw_df.index)
         except ValueError:
@@ -146,9 +165,15 @@ class TSDataset:
                 f"You probably set wrong freq. Discovered freq in you data is {inferred_freq}, you set {self.freq}"
             )
 
-        self.raw_df = self.raw_df.asfreq(self.freq)
+        if self.freq is not None and inferred_freq == self.freq:
+            # timestamps are already regular, data is only copied from the input and frequency of the index is set
+            self.raw_df = self.raw_df.copy(deep=True)
+            if self.raw_df.index.freq != self.freq:
+                self.raw_df.index = pd.DatetimeIndex(self.raw_df.index, freq=self.freq)
+        else:
+            self.raw_df = self.raw_df.asfreq(self.freq)
 
-        self.df = self.raw_df.copy(deep=True)
+        self.df = self.raw_df
 
         self.known_future = self._check_known_future(known_future, df_exog)
         self._regressors = copy(self.known_future)
@@ -159,14 +184,75 @@ class TSDataset:
 
         if df_exog is not None:
             self.df_exog = df_exog.copy(deep=True)
-            self.df_exog.index = pd.to_datetime(self.df_exog.index)
+            if not isinstance(self.df_exog.index, pd.DatetimeIndex):
+                self.df_exog.index = pd.to_datetime(self.df_exog.index)
             self.current_df_exog_level = self._get_dataframe_level(df=self.df_exog)
             if self.current_df_level == self.current_df_exog_level:
                 self.df = self._merge_exog(self.df)
 
         self._target_components_names: Tuple[str, ...] = tuple()
 
-        self.df = self.df.sort_index(axis=1, level=("segment", "feature"))
+        self.df = _sort_columns(self.df)
+        if self.df is self.raw_df:
+            # data is copied only if it isn't done by merging with exog or sorting the columns
+            self.df = self.raw_df.copy(deep=True)
+
+    def __getstate__(self) -> Dict[str, Any]:
+        """Get state for pickling and copying, cache of columns is dropped as it is bound to ids of objects."""
+        state = self.__dict__.copy()
+        state["_columns_cache"] = {}
+        return state
+
+    @property
+    def _col_cache(self) -> Dict[str, Any]:
+        """Get cache for the data derived from the columns of ``self.df``.
+
+        Cache is bound to the columns object. Reassignment of ``self.df`` or any change of its columns
+        creates a new columns object, so the outdated cache is never used.
+        """
+        columns = self.df.columns
+        key = id(columns)
+        if key in self._columns_cache and self._columns_cache[key][0] is not columns:
+            del self._columns_cache[key]
+        if key not in self._columns_cache:
+            if len(self._columns_cache) >= self._columns_cache_size:
+                del self._columns_cache[next(iter(self._columns_cache))]
+            # columns object is stored to keep it alive, so its id can't be reused by another object
+            self._columns_cache[key] = (columns, {})
+        return self._columns_cache[key][1]
+
+    @property
+    def _feature_names(self) -> FrozenSet[str]:
+        """Get set of features in ``self.df``."""
+        cache = self._col_cache
+        if "feature_names" not in cache:
+            cache["feature_names"] = frozenset(self.df.columns.get_level_values("feature").unique())
+        return cache["feature_names"]
+
+    def _get_features_positions(self, features: Sequence[str]) -> np.ndarray:
+        """Get positions of columns of ``self.df`` with given features."""
+        positions_cache = self._col_cache.setdefault("features_positions", {})
+        key = tuple(features)
+        if key not in positions_cache:
+            positions_cache[key] = _get_features_positions(columns=self.df.columns, features=features)
+        return positions_cache[key]
+
+    def _get_columns_positions(self, columns: Iterable[Tuple[str, str]]) -> np.ndarray:
+        """Get positions of given ``(segment, feature)`` columns in ``self.df``.
+
+        Raises
+        ------
+        KeyError:
+            If some of the columns aren't present in ``self.df``
+        """
+        cache = self._col_cache
+        if "columns_positions" not in cache:
+            cache["columns_positions"] = {column: i for i, column in enumerate(self.df.columns)}
+        columns_positions = cache["columns_positions"]
+        try:
+            return np.array([columns_positions[column] for column in columns], dtype=np.int64)
+        except KeyError as e:
+            raise KeyError(f"Column {e.args[0]} is not present in df!")
 
     def _get_dataframe_level(self, df: pd.DataFrame) -> Optional[str]:
         """Return the level of the passed dataframe in hierarchical structure."""
@@ -174,7 +260,7 @@ class TSDataset:
             return None
 
         df_segments = df.columns.get_level_values("segment").unique()
-        segment_levels = {self.hierarchical_structure.get_segment_level(segment=segment) for segment in df_segments}
+        segment_levels = self.hierarchical_structure.get_segments_levels(segments=df_segments)
         if len(segment_levels) != 1:
             raise ValueError("Segments in dataframe are from more than 1 hierarchical levels!")
 
@@ -201,11 +287,23 @@ class TSDataset:
 
     @staticmethod
     def _prepare_df(df: pd.DataFrame) -> pd.DataFrame:
+        # data isn't copied here, it is copied during setting the frequency of raw_df
+        df_copy = df.copy(deep=False)
+
         # cast segment to str type
-        df_copy = df.copy(deep=True)
-        columns_frame = df.columns.to_frame()
-        columns_frame["segment"] = columns_frame["segment"].astype(str)
-        df_copy.columns = pd.MultiIndex.from_frame(columns_frame)
+        segment_level_number = df.columns.names.index("segment")
+        segment_level = df.columns.levels[segment_level_number]
+        if pd.api.types.infer_dtype(segment_level, skipna=False) == "string":
+            return df_copy
+
+        new_segment_level = segment_level.astype(str)
+        if new_segment_level.is_unique:
+            df_copy.columns = df.columns.set_levels(new_segment_level, level="segment")
+        else:
+            # different segments can have the same string representation, e.g. 1 and "1"
+            columns_frame = df.columns.to_frame()
+            columns_frame["segment"] = columns_frame["segment"].astype(str)
+            df_copy.columns = pd.MultiIndex.from_frame(columns_frame)
         return df_copy
 
     def __repr__(self):
@@ -223,8 +321,7 @@ class TSDataset:
             df = self.df.loc[self.idx[item[0]]]
         else:
             df = self.df.loc[self.idx[item[0]], self.idx[item[1], item[2]]]
-        first_valid_idx = df.first_valid_index()
-        df = df.loc[first_valid_idx:]
+        df = _slice_from_first_valid(df)
         return df
 
     def make_future(
@@ -289,9 +386,13 @@ class TSDataset:
 
             # check if we have enough values in regressors
             if self.regressors:
-                for segment in self.segments:
-                    regressors_index = self.df_exog.loc[:, pd.IndexSlice[segment, self.regressors]].index
-                    if not np.all(future_dates.isin(regressors_index)):
+                # index is shared by all the segments, so segments are checked only if some dates are missing in it
+                missing_dates = future_dates.difference(self.df_exog.index)
+                if len(missing_dates) > 0:
+                    df_regressors = _select_features(df=df, features=self.regressors).loc[missing_dates]
+                    is_missing = df_regressors.isna().values.any(axis=0)
+                    missing_segments = df_regressors.columns.get_level_values("segment")[is_missing].unique()
+                    for segment in missing_segments:
                         warnings.warn(
                             f"Some regressors don't have enough values in segment {segment}, "
                             f"NaN-s will be used for missing values"
@@ -305,23 +406,23 @@ class TSDataset:
         if len(self.target_quantiles_names) > 0:
             df = df.drop(columns=list(self.target_quantiles_names), level="feature")
 
-        # Here only df is required, other metadata is not necessary to build the dataset
-        ts = TSDataset(df=df, freq=self.freq)
-        for transform in transforms:
-            tslogger.log(f"Transform {repr(transform)} is applied to dataset")
-            transform.transform(ts)
-        df = ts.to_pandas()
-
-        future_dataset = df.tail(future_steps + tail_steps).copy(deep=True)
+        if len(transforms) > 0:
+            # Here only df is required, other metadata is not necessary to build the dataset
+            ts = TSDataset(df=df, freq=self.freq)
+            for transform in transforms:
+                tslogger.log(f"Transform {repr(transform)} is applied to dataset")
+                transform.transform(ts)
+            df = ts.to_pandas()
 
-        future_dataset = future_dataset.sort_index(axis=1, level=(0, 1))
+        # data is copied and columns are sorted if necessary during creation of the dataset
+        future_dataset = df.tail(future_steps + tail_steps)
         future_ts = TSDataset(df=future_dataset, freq=self.freq, hierarchical_structure=self.hierarchical_structure)
 
         # can't put known_future into constructor, _check_known_future fails with df_exog=None
-        future_ts.known_future = deepcopy(self.known_future)
-        future_ts._regressors = deepcopy(self.regressors)
+        future_ts.known_future = list(self.known_future)
+        future_ts._regressors = list(self.regressors)
         if self.df_exog is not None:
-            future_ts.df_exog = self.df_exog.copy(deep=True)
+            future_ts.df_exog = self.df_exog
         return future_ts
 
     def tsdataset_idx_slice(self, start_idx: Optional[int] = None, end_idx: Optional[int] = None) -> "TSDataset":
@@ -342,11 +443,11 @@ class TSDataset:
         df_slice = self.df.iloc[start_idx:end_idx].copy(deep=True)
         tsdataset_slice = TSDataset(df=df_slice, freq=self.freq)
         # can't put known_future into constructor, _check_known_future fails with df_exog=None
-        tsdataset_slice.known_future = deepcopy(self.known_future)
-        tsdataset_slice._regressors = deepcopy(self.regressors)
+        tsdataset_slice.known_future = list(self.known_future)
+        tsdataset_slice._regressors = list(self.regressors)
         if self.df_exog is not None:
-            tsdataset_slice.df_exog = self.df_exog.copy(deep=True)
-        tsdataset_slice._target_components_names = deepcopy(self._target_components_names)
+            tsdataset_slice.df_exog = self.df_exog
+        tsdataset_slice._target_components_names = self._target_components_names
         return tsdataset_slice
 
     @staticmethod
@@ -376,46 +477,77 @@ class TSDataset:
 
     @staticmethod
     def _check_regressors(df: pd.DataFrame, df_regressors: pd.DataFrame):
-        """Check that regressors begin not later than in ``df`` and end later than in ``df``."""
+        """Check that regressors begin not later than in ``df`` and end later than in ``df``.
+
+        Raises
+        ------
+        ValueError:
+            If some segment of ``df`` has no regressors
+        ValueError:
+            If regressors of some segment start later or end not later than its target
+        """
         if df_regressors.shape[1] == 0:
             return
-        # TODO: check performance
-        df_segments = df.columns.get_level_values("segment")
-        for segment in df_segments:
-            target_min = df[segment]["target"].first_valid_index()
-            target_min = pd.NaT if target_min is None else target_min
-            target_max = df[segment]["target"].last_valid_index()
-            target_max = pd.NaT if target_max is None else target_max
-
-            exog_series_min = df_regressors[segment].first_valid_index()
-            exog_series_min = pd.NaT if exog_series_min is None else exog_series_min
-            exog_series_max = df_regressors[segment].last_valid_index()
-            exog_series_max = pd.NaT if exog_series_max is None else exog_series_max
-            if target_min < exog_series_min:
-                raise ValueError(
-                    f"All the regressor series should start not later than corresponding 'target'."
-                    f"Series of segment {segment} have not enough history: "
-                    f"{target_min} < {exog_series_min}."
-                )
-            if target_max >= exog_series_max:
-                raise ValueError(
-                    f"All the regressor series should finish later than corresponding 'target'."
-                    f"Series of segment {segment} have not enough history: "
-                    f"{target_max} >= {exog_series_max}."
-                )
+
+        df_target = df.xs("target", axis=1, level="feature")
+        segments = df_target.columns
+        target_min, target_max = _get_valid_timestamps_bounds(index=df_target.index, not_na=df_target.notna().values)
+
+        # regressors of the segment are valid at timestamp if at least one of them is valid
+        regressors_segments_positions = segments.get_indexer(df_regressors.columns.get_level_values("segment"))
+        is_known_segment = regressors_segments_positions >= 0
+        has_regressors = np.zeros(len(segments), dtype=bool)
+        has_regressors[regressors_segments_positions[is_known_segment]] = True
+        if not has_regressors.all():
+            segment = segments[np.argmin(has_regressors)]
+            raise ValueError(f"Regressors are not present for segment {segment}!")
+
+        regressors_not_na = np.zeros((len(segments), len(df_regressors.index)), dtype=bool)
+        np.logical_or.at(
+            regressors_not_na,
+            regressors_segments_positions[is_known_segment],
+            df_regressors.notna().values[:, is_known_segment].T,
+        )
+        exog_series_min, exog_series_max = _get_valid_timestamps_bounds(
+            index=df_regressors.index, not_na=regressors_not_na.T
+        )
+
+        starts_later = target_min < exog_series_min
+        ends_earlier = target_max >= exog_series_max
+        failed = starts_later | ends_earlier
+        if not failed.any():
+            return
+
+        i = np.argmax(failed)
+        segment = segments[i]
+        if starts_later[i]:
+            raise ValueError(
+                f"All the regressor series should start not later than corresponding 'target'."
+                f"Series of segment {segment} have not enough history: "
+                f"{pd.Timestamp(target_min[i])} < {pd.Timestamp(exog_series_min[i])}."
+            )
+        raise ValueError(
+            f"All the regressor series should finish later than corresponding 'target'."
+            f"Series of segment {segment} have not enough history: "
+            f"{pd.Timestamp(target_max[i])} >= {pd.Timestamp(exog_series_max[i])}."
+        )
 
     def _merge_exog(self, df: pd.DataFrame) -> pd.DataFrame:
         if self.df_exog is None:
             raise ValueError("Something went wrong, Trying to merge df_exog which is None!")
-        df_regressors = self.df_exog.loc[:, pd.IndexSlice[:, self.known_future]]
+        df_regressors = _select_features(df=self.df_exog, features=self.known_future)
         self._check_regressors(df=df, df_regressors=df_regressors)
-        df = pd.concat((df, self.df_exog), axis=1).loc[df.index].sort_index(axis=1, level=(0, 1))
+        # align exog on the index of df first, so concatenation doesn't make rows that are dropped after it
+        df_exog = self.df_exog.reindex(index=df.index, copy=False)
+        df = pd.concat((df, df_exog), axis=1)
+        df = _sort_columns(df)
         return df
 
     def _check_endings(self, warning=False):
         """Check that all targets ends at the same timestamp."""
-        max_index = self.df.index.max()
-        if np.any(pd.isna(self.df.loc[max_index, pd.IndexSlice[:, "target"]])):
+        last_row = self.df.index.argmax()
+        target_positions = self._get_features_positions(features=["target"])
+        if np.any(pd.isna(self.df.iloc[last_row, target_positions])):
             if warning:
                 warnings.warn(
                     "Segments contains NaNs in the last timestamps."
@@ -476,7 +608,10 @@ class TSDataset:
         >>> ts.segments
         ['segment_0', 'segment_1']
         """
-        return self.df.columns.get_level_values("segment").unique().tolist()
+        cache = self._col_cache
+        if "segments" not in cache:
+            cache["segments"] = tuple(self.df.columns.get_level_values("segment").unique())
+        return list(cache["segments"])
 
     @property
     def regressors(self) -> List[str]:
@@ -515,7 +650,10 @@ class TSDataset:
     @property
     def target_quantiles_names(self) -> Tuple[str, ...]:
         """Get tuple with target quantiles names. Return the empty tuple in case of quantile absence."""
-        return tuple(match_target_quantiles(features=set(self.columns.get_level_values("feature"))))
+        cache = self._col_cache
+        if "target_quantiles_names" not in cache:
+            cache["target_quantiles_names"] = tuple(match_target_quantiles(features=set(self._feature_names)))
+        return cache["target_quantiles_names"]
 
     def plot(
         self,
@@ -560,8 +698,9 @@ class TSDataset:
         _, ax = plt.subplots(rows_num, columns_num, figsize=figsize, squeeze=False)
         ax = ax.ravel()
         rnd_state = np.random.RandomState(seed)
+        df_period = self.df.loc[start:end]  # type: ignore
         for i, segment in enumerate(sorted(rnd_state.choice(segments, size=k, replace=False))):
-            df_slice = self[start:end, segment, column]  # type: ignore
+            df_slice = _slice_from_first_valid(df_period.loc[:, (segment, column)])
             ax[i].plot(df_slice.index, df_slice.values)
             ax[i].set_title(segment)
             ax[i].grid()
@@ -610,27 +749,32 @@ class TSDataset:
         4 2021-06-05  segment_0    1.0
         """
         segments = df.columns.get_level_values("segment").unique()
-        dtypes = df.dtypes
-        category_columns = dtypes[dtypes == "category"].index.get_level_values(1).unique()
+        is_category = np.array([isinstance(dtype, pd.CategoricalDtype) for dtype in df.dtypes.values], dtype=bool)
+        category_columns = frozenset(df.columns.get_level_values("feature")[is_category])
         if isinstance(features, str):
             if features != "all":
                 raise ValueError("The only possible literal is 'all'")
         else:
-            df = df.loc[:, pd.IndexSlice[segments, features]].copy()
+            df = _select_features(df=df, features=features)
         columns = df.columns.get_level_values("feature").unique()
 
         # flatten dataframe
         df_dict: Dict[str, Any] = {}
-        df_dict["timestamp"] = np.tile(df.index, len(segments))
+        # tiling of positions keeps the dtype of index without conversion of timestamps to numpy objects
+        df_dict["timestamp"] = df.index.take(np.tile(np.arange(len(df.index)), len(segments)))
         df_dict["segment"] = np.repeat(segments, len(df.index))
         if "target" in columns:
             # set this value to lock position of key "target" in output dataframe columns
             # None is a placeholder, actual column value will be assigned in the following cycle
             df_dict["target"] = None
+        numeric_values = _flatten_numeric_features(df=df, segments=segments, features=columns)
         for column in columns:
+            if column in numeric_values:
+                df_dict[column] = numeric_values[column]
+                continue
             df_cur = df.loc[:, pd.IndexSlice[:, column]]
             if column in category_columns:
-                df_dict[column] = pd.api.types.union_categoricals([df_cur[col] for col in df_cur.columns])
+                df_dict[column] = _flatten_categorical(df_cur)
             else:
                 stacked = df_cur.values.T.ravel()
                 # creating series is necessary for dtypes like "Int64", "boolean", otherwise they will be objects
@@ -696,8 +840,7 @@ class TSDataset:
                 if features == "all":
                     return self.df.copy()
                 raise ValueError("The only possible literal is 'all'")
-            segments = self.columns.get_level_values("segment").unique().tolist()
-            return self.df.loc[:, self.idx[segments, features]].copy()
+            return self.df.iloc[:, self._get_features_positions(features=features)]
         return self.to_flatten(self.df, features=features)
 
     @staticmethod
@@ -755,39 +898,64 @@ class TSDataset:
         2021-01-04           3           8
         2021-01-05           4           9
         """
-        df_copy = df.copy(deep=True)
-        df_copy["timestamp"] = pd.to_datetime(df_copy["timestamp"])
-        df_copy["segment"] = df_copy["segment"].astype(str)
-        feature_columns = df_copy.columns.tolist()
-        feature_columns.remove("timestamp")
-        feature_columns.remove("segment")
-        df_copy = df_copy.pivot(index="timestamp", columns="segment")
-        df_copy = df_copy.reorder_levels([1, 0], axis=1)
-        df_copy.columns.names = ["segment", "feature"]
-        df_copy = df_copy.sort_index(axis=1, level=(0, 1))
+        # input dataframe isn't changed by pivot, so it is copied only if some columns should be converted
+        df_copy = df
+        converted_columns = {}
+        if not pd.api.types.is_datetime64_any_dtype(df["timestamp"]):
+            converted_columns["timestamp"] = _timestamps_to_datetime(df["timestamp"])
+        if df["segment"].dtype != object or pd.api.types.infer_dtype(df["segment"], skipna=False) != "string":
+            converted_columns["segment"] = df["segment"].astype(str)
+        if len(converted_columns) > 0:
+            df_copy = df.assign(**converted_columns)
+        df_copy = df_copy.set_index(["timestamp", "segment"]).unstack(level="segment")
+        # dataframe after unstack is new, so its columns can be changed without copying the data
+        df_copy.columns = df_copy.columns.reorder_levels([1, 0]).set_names(["segment", "feature"])
+        df_copy = _sort_columns(df_copy)
         return df_copy
 
+    @staticmethod
+    def _get_level_columns_segments(df: pd.DataFrame, level_columns: List[str], sep: str) -> List[pd.Series]:
+        """Get names of segments on each level of hierarchy by concatenation of level columns.
+
+        Raises
+        ------
+        ValueError
+            If level columns contain missing values
+        """
+        if df[level_columns].isna().values.any():
+            raise ValueError("Level columns shouldn't contain missing values!")
+
+        level_columns_segments = [df[level_columns[0]].astype("string")]
+        for level_column in level_columns[1:]:
+            level_column_segments = level_columns_segments[-1].str.cat(df[level_column].astype("string"), sep=sep)
+            level_columns_segments.append(level_column_segments)
+        return level_columns_segments
+
     @staticmethod
     def _hierarchical_structure_from_level_columns(
-        df: pd.DataFrame, level_columns: List[str], sep: str
+        level_columns_segments: List[pd.Series], level_columns: List[str]
     ) -> HierarchicalStructure:
-        """Create hierarchical structure from dataframe columns."""
-        df_level_columns = df[level_columns].astype("string")
-
-        prev_level_name = level_columns[0]
-        for cur_level_name in level_columns[1:]:
-            df_level_columns[cur_level_name] = (
-                df_level_columns[prev_level_name] + sep + df_level_columns[cur_level_name]
-            )
-            prev_level_name = cur_level_name
+        """Create hierarchical structure from names of segments on each level of hierarchy.
 
-        level_structure = {"total": list(df_level_columns[level_columns[0]].unique())}
-        cur_level_name = level_columns[0]
-        for next_level_name in level_columns[1:]:
-            cur_level_to_next_level_edges = df_level_columns[[cur_level_name, next_level_name]].drop_duplicates()
-            cur_level_to_next_level_adjacency_list = cur_level_to_next_level_edges.groupby(cur_level_name).agg(list)
-            level_structure.update(cur_level_to_next_level_adjacency_list.to_records())
-            cur_level_name = next_level_name
+        Raises
+        ------
+        ValueError
+            If names of segments contain missing values
+        """
+        if any(level_segments.isna().any() for level_segments in level_columns_segments):
+            raise ValueError("Level columns shouldn't contain missing values!")
+
+        # segments are numbered in order of their first appearance
+        cur_level_codes, cur_level_segments = pd.factorize(level_columns_segments[0])
+        level_structure: Dict[str, List[str]] = {"total": list(cur_level_segments)}
+        for next_level_column_segments in level_columns_segments[1:]:
+            next_level_codes, next_level_segments = pd.factorize(next_level_column_segments)
+            # name of the segment contains the name of its parent, so each segment has exactly one parent
+            _, first_occurrences = np.unique(next_level_codes, return_index=True)
+            parents = cur_level_segments[cur_level_codes[first_occurrences]]
+            for parent, segment in zip(parents, next_level_segments):
+                level_structure.setdefault(parent, []).append(segment)
+            cur_level_codes, cur_level_segments = next_level_codes, next_level_segments
 
         hierarchical_structure = HierarchicalStructure(
             level_structure=level_structure, level_names=["total"] + level_columns
@@ -829,24 +997,41 @@ class TSDataset:
         ------
         ValueError
             If ``level_columns`` is empty
+        ValueError
+            If level columns contain missing values
         """
         if len(level_columns) == 0:
             raise ValueError("Value of level_columns shouldn't be empty!")
 
-        df_copy = df.copy(deep=True)
-        df_copy["segment"] = df_copy[level_columns].astype("string").agg(sep.join, axis=1)
-        if not keep_level_columns:
-            df_copy.drop(columns=level_columns, inplace=True)
+        level_columns_segments = TSDataset._get_level_columns_segments(df=df, level_columns=level_columns, sep=sep)
+        segment = level_columns_segments[-1]
+
+        if keep_level_columns:
+            df_copy = df.assign(segment=segment)
+        else:
+            # dropping of columns makes a new dataframe, so the column can be set without changing the input
+            df_copy = df.drop(columns=level_columns)
+            df_copy["segment"] = segment
         df_copy = TSDataset.to_dataset(df_copy)
 
         hierarchical_structure = None
         if return_hierarchy:
             hierarchical_structure = TSDataset._hierarchical_structure_from_level_columns(
-                df=df, level_columns=level_columns, sep=sep
+                level_columns_segments=level_columns_segments, level_columns=level_columns
             )
 
         return df_copy, hierarchical_structure
 
+    def _get_timestamp_position(self, timestamp: TTimestamp) -> int:
+        """Get position of the timestamp in the index, binary search is used if the index is sorted."""
+        index = self.df.index
+        if not index.is_monotonic_increasing:
+            return index.get_loc(timestamp)
+        position = int(index.searchsorted(timestamp))
+        if position == len(index) or index[position] != pd.Timestamp(timestamp):
+            raise KeyError(timestamp)
+        return position
+
     def _find_all_borders(
         self,
         train_start: Optional[TTimestamp],
@@ -861,25 +1046,30 @@ class TSDataset:
                 "test_size, test_start and test_end cannot be applied at the same time. test_size will be ignored"
             )
 
+        index = self.df.index
+        # position of test start is kept once it is found, so it isn't searched in the index again
+        test_start_idx: Optional[int] = None
+
         if test_end is None:
             if test_start is not None and test_size is not None:
-                test_start_idx = self.df.index.get_loc(test_start)
-                if test_start_idx + test_size > len(self.df.index):
+                test_start_idx = self._get_timestamp_position(test_start)
+                if test_start_idx + test_size > len(index):
                     raise ValueError(
-                        f"test_size is {test_size}, but only {len(self.df.index) - test_start_idx} available with your test_start"
+                        f"test_size is {test_size}, but only {len(index) - test_start_idx} available with your test_start"
                     )
-                test_end_defined = self.df.index[test_start_idx + test_size]
+                test_end_defined = index[test_start_idx + test_size]
             elif test_size is not None and train_end is not None:
-                test_start_idx = self.df.index.get_loc(train_end)
-                test_start = self.df.index[test_start_idx + 1]
-                test_end_defined = self.df.index[test_start_idx + test_size]
+                train_end_idx = self._get_timestamp_position(train_end)
+                test_start_idx = train_end_idx + 1
+                test_start = index[test_start_idx]
+                test_end_defined = index[train_end_idx + test_size]
             else:
-                test_end_defined = self.df.index.max()
+                test_end_defined = index.max()
         else:
             test_end_defined = test_end
 
         if train_start is None:
-            train_start_defined = self.df.index.min()
+            train_start_defined = index.min()
         else:
             train_start_defined = train_start
 
@@ -888,30 +1078,31 @@ class TSDataset:
 
         if test_size is None:
             if train_end is None:
-                test_start_idx = self.df.index.get_loc(test_start)
-                train_end_defined = self.df.index[test_start_idx - 1]
+                test_start_idx = self._get_timestamp_position(test_start)
+                train_end_defined = index[test_start_idx - 1]
             else:
                 train_end_defined = train_end
 
             if test_start is None:
-                train_end_idx = self.df.index.get_loc(train_end)
-                test_start_defined = self.df.index[train_end_idx + 1]
+                train_end_idx = self._get_timestamp_position(train_end)
+                test_start_defined = index[train_end_idx + 1]
             else:
                 test_start_defined = test_start
         else:
             if test_start is None:
-                test_start_idx = self.df.index.get_loc(test_end_defined)
-                test_start_defined = self.df.index[test_start_idx - test_size + 1]
+                test_start_idx = self._get_timestamp_position(test_end_defined) - test_size + 1
+                test_start_defined = index[test_start_idx]
             else:
                 test_start_defined = test_start
 
             if train_end is None:
-                test_start_idx = self.df.index.get_loc(test_start_defined)
-                train_end_defined = self.df.index[test_start_idx - 1]
+                if test_start_idx is None:
+                    test_start_idx = self._get_timestamp_position(test_start_defined)
+                train_end_defined = index[test_start_idx - 1]
             else:
                 train_end_defined = train_end
 
-        if np.datetime64(test_start_defined) < np.datetime64(train_end_defined):
+        if pd.Timestamp(test_start_defined) < pd.Timestamp(train_end_defined):
             raise ValueError("The beginning of the test goes before the end of the train")
 
         return train_start_defined, train_end_defined, test_start_defined, test_end_defined
@@ -985,7 +1176,11 @@ class TSDataset:
         if pd.Timestamp(train_start_defined) < self.df.index.min():
             warnings.warn(f"Min timestamp in df is {self.df.index.min()}.")
 
-        train_df = self.df[train_start_defined:train_end_defined][self.raw_df.columns]  # type: ignore
+        # columns of raw_df are found in df once and used for both train and test
+        raw_columns_positions = self._get_columns_positions(columns=self.raw_df.columns)
+
+        train_rows = self.df.index.slice_indexer(train_start_defined, train_end_defined)
+        train_df = self.df.iloc[train_rows, raw_columns_positions]
         train_raw_df = self.raw_df[train_start_defined:train_end_defined]  # type: ignore
         train = TSDataset(
             df=train_df,
@@ -995,10 +1190,11 @@ class TSDataset:
             hierarchical_structure=self.hierarchical_structure,
         )
         train.raw_df = train_raw_df
-        train._regressors = deepcopy(self.regressors)
-        train._target_components_names = deepcopy(self.target_components_names)
+        train._regressors = list(self.regressors)
+        train._target_components_names = self.target_components_names
 
-        test_df = self.df[test_start_defined:test_end_defined][self.raw_df.columns]  # type: ignore
+        test_rows = self.df.index.slice_indexer(test_start_defined, test_end_defined)
+        test_df = self.df.iloc[test_rows, raw_columns_positions]
         test_raw_df = self.raw_df[train_start_defined:test_end_defined]  # type: ignore
         test = TSDataset(
             df=test_df,
@@ -1008,8 +1204,8 @@ class TSDataset:
             hierarchical_structure=self.hierarchical_structure,
         )
         test.raw_df = test_raw_df
-        test._regressors = deepcopy(self.regressors)
-        test._target_components_names = deepcopy(self.target_components_names)
+        test._regressors = list(self.regressors)
+        test._target_components_names = self.target_components_names
         return train, test
 
     def update_columns_from_pandas(self, df_update: pd.DataFrame):
@@ -1024,11 +1220,43 @@ class TSDataset:
         df_update:
             Dataframe with new values in wide ETNA format.
         """
-        columns_to_update = sorted(set(df_update.columns.get_level_values("feature")))
+        columns_to_update = _get_level_unique_values(columns=df_update.columns, level="feature")
+        df_update = df_update.loc[: self.df.index.max()]
+        if self._update_columns_by_positions(df_update=df_update, features=columns_to_update):
+            return
         self.df.loc[:, self.idx[self.segments, columns_to_update]] = df_update.loc[
-            : self.df.index.max(), self.idx[self.segments, columns_to_update]
+            :, self.idx[self.segments, columns_to_update]
         ]
 
+    def _update_columns_by_positions(self, df_update: pd.DataFrame, features: List[str]) -> bool:
+        """Try to update columns of df with values of df_update without alignment by labels.
+
+        It is possible only if df_update has the same timestamps as df, all the segments of df have all the features
+        and updated columns in both dataframes have the same numpy dtype.
+
+        Returns
+        -------
+        :
+            True if columns are updated, False otherwise
+        """
+        if not df_update.index.equals(self.df.index) or not set(features).issubset(self._feature_names):
+            return False
+
+        positions = self._get_features_positions(features=features)
+        if len(positions) != len(self.segments) * len(features):
+            return False
+        update_positions = df_update.columns.get_indexer(self.df.columns[positions])
+        if np.any(update_positions == -1):
+            return False
+
+        dtypes = np.concatenate((self.df.dtypes.values[positions], df_update.dtypes.values[update_positions]))
+        dtype = dtypes[0]
+        if not isinstance(dtype, np.dtype) or not all(cur_dtype == dtype for cur_dtype in dtypes):
+            return False
+
+        self.df.iloc[:, positions] = df_update.iloc[:, update_positions].values
+        return True
+
     def add_columns_from_pandas(
         self, df_update: pd.DataFrame, update_exog: bool = False, regressors: Optional[List[str]] = None
     ):
@@ -1046,12 +1274,12 @@ class TSDataset:
         regressors:
             List of regressors in the passed dataframe.
         """
-        self.df = pd.concat((self.df, df_update[: self.df.index.max()]), axis=1).sort_index(axis=1)
+        self.df = _sort_columns(pd.concat((self.df, df_update[: self.df.index.max()]), axis=1))
         if update_exog:
             if self.df_exog is None:
                 self.df_exog = df_update
             else:
-                self.df_exog = pd.concat((self.df_exog, df_update), axis=1).sort_index(axis=1)
+                self.df_exog = _sort_columns(pd.concat((self.df_exog, df_update), axis=1))
         if regressors is not None:
             self._regressors = list(set(self._regressors) | set(regressors))
 
@@ -1077,18 +1305,19 @@ class TSDataset:
                 "Target components can't be dropped from the dataset using this method! Use `drop_target_components` method!"
             )
 
-        dfs = [("df", self.df)]
+        dfs = [("df", self.df, self._feature_names)]
         if drop_from_exog:
-            dfs.append(("df_exog", self.df_exog))
+            exog_features = frozenset(self.df_exog.columns.get_level_values("feature").unique())  # type: ignore
+            dfs.append(("df_exog", self.df_exog, exog_features))
 
-        for name, df in dfs:
-            columns_in_df = df.columns.get_level_values("feature")
-            columns_to_remove = list(set(columns_in_df) & set(features))
+        for name, df, columns_in_df in dfs:
+            columns_to_remove = list(columns_in_df & set(features))
             unknown_columns = set(features) - set(columns_to_remove)
             if len(unknown_columns) > 0:
                 warnings.warn(f"Features {unknown_columns} are not present in {name}!")
             if len(columns_to_remove) > 0:
-                df.drop(columns=columns_to_remove, level="feature", inplace=True)
+                # df_exog can be shared with other datasets, so it shouldn't be changed inplace
+                setattr(self, name, df.drop(columns=columns_to_remove, level="feature"))
         self._regressors = list(set(self._regressors) - set(features))
 
     @property
@@ -1152,11 +1381,11 @@ class TSDataset:
             )
 
         else:
-            target_level_df = self.to_pandas(features=target_names)
+            # columns are only selected from df below, so it isn't copied here
+            target_level_df = self.df
 
-        target_components_df = target_level_df.loc[:, pd.IndexSlice[:, self.target_components_names]]
-        if len(self.target_components_names) > 0:  # for pandas >=1.1, <1.2
-            target_level_df = target_level_df.drop(columns=list(self.target_components_names), level="feature")
+        target_components_df = _select_features(df=target_level_df, features=self.target_components_names)
+        target_level_df = _select_features(df=target_level_df, features=self.target_quantiles_names + ("target",))
 
         ts = TSDataset(
             df=target_level_df,
@@ -1190,24 +1419,31 @@ class TSDataset:
         if len(self.target_components_names) > 0:
             raise ValueError("Dataset already contains target components!")
 
-        components_names = sorted(target_components_df[self.segments[0]].columns.get_level_values("feature"))
-        for segment in self.segments:
-            components_names_segment = sorted(target_components_df[segment].columns.get_level_values("feature"))
-            if components_names != components_names_segment:
-                raise ValueError(
-                    f"Set of target components differs between segments '{self.segments[0]}' and '{segment}'!"
-                )
+        components_names = _get_level_unique_values(columns=target_components_df.columns, level="feature")
+        components_columns = pd.MultiIndex.from_product([self.segments, components_names])
+        # if all the segments have the same components, columns are exactly all the pairs of segments and components
+        if not target_components_df.columns.sort_values().equals(components_columns):
+            components_names = sorted(target_components_df[self.segments[0]].columns.get_level_values("feature"))
+            for segment in self.segments:
+                components_names_segment = sorted(target_components_df[segment].columns.get_level_values("feature"))
+                if components_names != components_names_segment:
+                    raise ValueError(
+                        f"Set of target components differs between segments '{self.segments[0]}' and '{segment}'!"
+                    )
 
-        components_sum = target_components_df.sum(axis=1, level="segment")
-        if not np.allclose(components_sum.values, self[..., "target"].values):
+        segments = self.segments
+        components_columns = pd.MultiIndex.from_product([segments, components_names])
+        components_positions = target_components_df.columns.get_indexer(components_columns)
+        components_values = target_components_df.iloc[:, components_positions].values.astype(float, copy=False)
+        components_sum = np.nansum(components_values.reshape(-1, len(segments), len(components_names)), axis=2)
+        target_values = self.df.iloc[:, self._get_features_positions(features=["target"])].values
+        if not np.allclose(components_sum, target_values):
             raise ValueError("Components don't sum up to target!")
 
         self._target_components_names = tuple(components_names)
-        self.df = (
-            pd.concat((self.df, target_components_df), axis=1)
-            .loc[self.df.index]
-            .sort_index(axis=1, level=("segment", "feature"))
-        )
+        # components are aligned on the index of df first, so concatenation doesn't make rows that are dropped after it
+        target_components_df = target_components_df.reindex(index=self.df.index, copy=False)
+        self.df = _sort_columns(pd.concat((self.df, target_components_df), axis=1))
 
     def get_target_components(self) -> Optional[pd.DataFrame]:
         """Get DataFrame with target components.
@@ -1312,7 +1548,7 @@ class TSDataset:
         """Gather information about dataset in general."""
         common_dict: Dict[str, Any] = {
             "num_segments": len(self.segments),
-            "num_exogs": self.df.columns.get_level_values("feature").difference(["target"]).nunique(),
+            "num_exogs": len(self._feature_names - {"target"}),
             "num_regressors": len(self.regressors),
             "num_known_future": len(self.known_future),
             "freq": self.freq,
@@ -1322,36 +1558,27 @@ class TSDataset:
 
     def _gather_segments_data(self, segments: Optional[Sequence[str]]) -> Dict[str, pd.Series]:
         """Gather information about each segment."""
-        segments_index: Union[slice, Sequence[str]]
         if segments is None:
-            segments_index = slice(None)
             segments = self.segments
+            target_positions = self._get_features_positions(features=["target"])
         else:
-            segments_index = segments
-            segments = segments
+            target_positions = self._get_columns_positions(columns=[(segment, "target") for segment in segments])
 
-        df = self.df.loc[:, (segments_index, "target")]
+        target_values = self.df.iloc[:, target_positions].values
+        min_idx, max_idx, num_valid = _get_valid_values_stats(target_values.astype(np.float64, copy=False))
 
-        num_timestamps = df.shape[0]
-        not_na = ~np.isnan(df.values)
-        min_idx = np.argmax(not_na, axis=0)
-        max_idx = num_timestamps - np.argmax(not_na[::-1, :], axis=0) - 1
+        # all-nans series are masked during construction of the columns
+        all_nans_mask = num_valid == 0
+        length = max_idx - min_idx + 1
 
         segments_dict = {}
-        segments_dict["start_timestamp"] = df.index[min_idx].to_series(index=segments)
-        segments_dict["end_timestamp"] = df.index[max_idx].to_series(index=segments)
-        segments_dict["length"] = pd.Series(max_idx - min_idx + 1, dtype="Int64", index=segments)
+        segments_dict["start_timestamp"] = self.df.index[min_idx].where(~all_nans_mask).to_series(index=segments)
+        segments_dict["end_timestamp"] = self.df.index[max_idx].where(~all_nans_mask).to_series(index=segments)
+        segments_dict["length"] = pd.Series(pd.arrays.IntegerArray(length, all_nans_mask.copy()), index=segments)
         segments_dict["num_missing"] = pd.Series(
-            segments_dict["length"] - np.sum(not_na, axis=0), dtype="Int64", index=segments
+            pd.arrays.IntegerArray(length - num_valid, all_nans_mask.copy()), index=segments
         )
 
-        # handle all-nans series
-        all_nans_mask = np.all(~not_na, axis=0)
-        segments_dict["start_timestamp"][all_nans_mask] = None
-        segments_dict["end_timestamp"][all_nans_mask] = None
-        segments_dict["length"][all_nans_mask] = None
-        segments_dict["num_missing"][all_nans_mask] = None
-
         return segments_dict
 
     def describe(self, segments: Optional[Sequence[str]] = None) -> pd.DataFrame:
@@ -1416,31 +1643,13 @@ class TSDataset:
         common_dict = self._gather_common_data()
 
         # gather segment information
-        segments_dict = self._gather_segments_data(segments)
+        segments_dict: Dict[str, Any] = self._gather_segments_data(segments)
 
-        if segments is None:
-            segments = self.segments
+        # combine information, columns are added in the order of the output and common values are broadcasted
+        segments_dict.update(common_dict)
 
-        # combine information
-        segments_dict["num_segments"] = [common_dict["num_segments"]] * len(segments)
-        segments_dict["num_exogs"] = [common_dict["num_exogs"]] * len(segments)
-        segments_dict["num_regressors"] = [common_dict["num_regressors"]] * len(segments)
-        segments_dict["num_known_future"] = [common_dict["num_known_future"]] * len(segments)
-        segments_dict["freq"] = [common_dict["freq"]] * len(segments)
-
-        result_df = pd.DataFrame(segments_dict, index=segments)
-        columns_order = [
-            "start_timestamp",
-            "end_timestamp",
-            "length",
-            "num_missing",
-            "num_segments",
-            "num_exogs",
-            "num_regressors",
-            "num_known_future",
-            "freq",
-        ]
-        result_df = result_df[columns_order]
+        # all the series of segments_dict share the same index, so there is no alignment during construction
+        result_df = pd.DataFrame(segments_dict)
         result_df.index.name = "segments"
         return result_df
 
@@ -1521,18 +1730,21 @@ class TSDataset:
 
         # add segment information
         segments_dict = self._gather_segments_data(segments)
-        segment_df = pd.DataFrame(segments_dict, index=segments)
+        segment_df = pd.DataFrame(segments_dict)
         segment_df.index.name = "segments"
 
-        with pd.option_context("display.width", None):
-            lines += segment_df.to_string().split("\n")
+        # to_string doesn't wrap lines without line_width, so display options aren't needed
+        lines.append(segment_df.to_string())
 
         # print the results
         result_string = "\n".join(lines)
         print(result_string)
 
     def to_torch_dataset(
-        self, make_samples: Callable[[pd.DataFrame], Union[Iterator[dict], Iterable[dict]]], dropna: bool = True
+        self,
+        make_samples: Callable[[pd.DataFrame], Union[Iterator[dict], Iterable[dict]]],
+        dropna: bool = True,
+        float_dtype: Optional[str] = None,
     ) -> "Dataset":
         """Convert the TSDataset to a :py:class:`torch.Dataset`.
 
@@ -1542,17 +1754,127 @@ class TSDataset:
             function that takes per segment DataFrame and returns iterabale of samples
         dropna:
             if ``True``, missing rows are dropped
+        float_dtype:
+            if set, ``float64`` columns are cast to this dtype (e.g. ``"float32"``) before passing to ``make_samples``
 
         Returns
         -------
         :
             :py:class:`torch.Dataset` with with train or test samples to infer on
         """
-        df = self.to_pandas(flatten=True)
-        if dropna:
-            df = df.dropna()  # TODO: Fix this
-
-        ts_segments = [df_segment for _, df_segment in df.groupby("segment")]
-        ts_samples = [samples for df_segment in ts_segments for samples in make_samples(df_segment)]
+        ts_segments = self._iterate_flatten_segments(dropna=dropna, float_dtype=float_dtype)
+        ts_samples = list(chain.from_iterable(make_samples(df_segment) for df_segment in ts_segments))
 
         return _TorchDataset(ts_samples=ts_samples)
+
+    def to_torch_dataset_windowed(
+        self,
+        encoder_length: int,
+        decoder_length: int,
+        features: Union[Literal["all"], Sequence[str]] = "all",
+        dropna: bool = True,
+    ) -> "Dataset":
+        """Convert the TSDataset to a :py:class:`torch.Dataset` of fixed-size sliding windows.
+
+        It is a fast alternative to :py:meth:`to_torch_dataset` for the case when samples are all windows of
+        length ``encoder_length + decoder_length`` with a step of one timestamp.
+        Each sample is a dict with the keys:
+
+        * encoder_real: values of features on encoder part, array of shape (encoder_length, n_features)
+
+        * decoder_real: values of features on decoder part, array of shape (decoder_length, n_features)
+
+        * encoder_target: values of target on encoder part, array of shape (encoder_length, 1)
+
+        * decoder_target: values of target on decoder part, array of shape (decoder_length, 1)
+
+        * segment: name of the segment
+
+        Parameters
+        ----------
+        encoder_length:
+            encoder length
+        decoder_length:
+            decoder length
+        features:
+            List of numeric features to put into samples, target is always used and shouldn't be passed.
+            If "all", all the numeric features in the dataset except target are used in alphabetical order.
+        dropna:
+            if ``True``, missing rows are dropped
+
+        Returns
+        -------
+        :
+            :py:class:`torch.Dataset` with with train or test samples to infer on
+
+        Raises
+        ------
+        ValueError:
+            if ``encoder_length`` or ``decoder_length`` is not positive
+        ValueError:
+            if target is passed in ``features``
+        ValueError:
+            if some of ``features`` aren't numeric
+        """
+        if encoder_length <= 0 or decoder_length <= 0:
+            raise ValueError("Parameters encoder_length and decoder_length should be positive!")
+
+        # feature is numeric only if it has numeric dtype in all the segments
+        is_numeric_feature: Dict[str, bool] = {}
+        for (_, feature), dtype in self.df.dtypes.items():
+            is_numeric_feature[feature] = is_numeric_feature.get(feature, True) and pd.api.types.is_numeric_dtype(dtype)
+
+        if isinstance(features, str):
+            if features != "all":
+                raise ValueError("The only possible literal is 'all'")
+            features = sorted(
+                feature for feature, is_numeric in is_numeric_feature.items() if is_numeric and feature != "target"
+            )
+        elif "target" in features:
+            raise ValueError("Target is always used and shouldn't be passed in features!")
+        else:
+            non_numeric_features = [feature for feature in features if not is_numeric_feature.get(feature, True)]
+            if len(non_numeric_features) > 0:
+                raise ValueError(f"Features {non_numeric_features} aren't numeric!")
+        window_columns = ["target"] + list(features)
+
+        segments_windows: List[np.ndarray] = []
+        for segment in self.segments:
+            positions = self._get_columns_positions(columns=[(segment, column) for column in window_columns])
+            values = self.df.iloc[:, positions].to_numpy(dtype=np.float32)
+            if dropna:
+                values = values[~np.isnan(values).any(axis=1)]
+            segments_windows.append(_make_windows(values, encoder_length + decoder_length))
+
+        # samples are stored as slices of one contiguous array instead of a dict per sample
+        windows = np.concatenate(segments_windows)
+        segments = np.repeat(np.array(self.segments, dtype=object), [len(cur) for cur in segments_windows])
+        arrays = {
+            "encoder_real": windows[:, :encoder_length, 1:],
+            "decoder_real": windows[:, encoder_length:, 1:],
+            "encoder_target": windows[:, :encoder_length, :1],
+            "decoder_target": windows[:, encoder_length:, :1],
+            "segment": segments,
+        }
+        return _TorchArraysDataset(arrays=arrays)
+
+    def _iterate_flatten_segments(self, dropna: bool, float_dtype: Optional[str] = None) -> Iterator[pd.DataFrame]:
+        """Lazily yield flatten dataframes of segments, segments without rows are skipped."""
+        df = self.to_flatten(self.df)
+        if float_dtype is not None:
+            float_columns = df.select_dtypes(include=[np.float64]).columns
+            df = df.astype(dict.fromkeys(float_columns, float_dtype))
+        if dropna:
+            not_nans = ~df.isna().values.any(axis=1)
+
+        # flatten dataframe is segment-major with the same number of rows in each segment
+        num_timestamps = len(self.df.index)
+        segments = self.df.columns.get_level_values("segment").unique()
+        for i in range(len(segments)):
+            segment_rows = slice(i * num_timestamps, (i + 1) * num_timestamps)
+            df_segment = df.iloc[segment_rows]
+            if dropna and not not_nans[segment_rows].all():
+                df_segment = df_segment.iloc[not_nans[segment_rows]]  # TODO: Fix this
+            if len(df_segment) == 0:
+                continue
+            yield df_segment
@@ -1,10 +1,14 @@
 import re
 from enum import Enum
+from typing import Dict
 from typing import List
 from typing import Optional
 from typing import Sequence
 from typing import Set
+from typing import Tuple
+from typing import TypeVar
 
+import numba
 import numpy as np
 import pandas as pd
 from scipy.sparse import csr_matrix
@@ -18,6 +22,8 @@ else:
 
     Dataset = Mock  # type: ignore
 
+TPandasData = TypeVar("TPandasData", pd.Series, pd.DataFrame)
+
 
 class DataFrameFormat(str, Enum):
     """Enum for different types of result."""
@@ -127,6 +133,35 @@ class _TorchDataset(Dataset):
         return len(self.ts_samples)
 
 
+class _TorchArraysDataset(Dataset):
+    """In memory dataset for torch dataloader that stores each key of samples in one array."""
+
+    def __init__(self, arrays: Dict[str, np.ndarray]):
+        """Init torch dataset.
+
+        Parameters
+        ----------
+        arrays:
+            arrays with values of each key of samples, sample ``i`` is made of ``i``-th elements of arrays
+
+        Raises
+        ------
+        ValueError:
+            if arrays have different lengths
+        """
+        lengths = {len(array) for array in arrays.values()}
+        if len(lengths) > 1:
+            raise ValueError("All the arrays should have the same length!")
+        self.arrays = arrays
+        self._length = lengths.pop() if len(lengths) > 0 else 0
+
+    def __getitem__(self, index):
+        return {key: array[index] for key, array in self.arrays.items()}
+
+    def __len__(self):
+        return self._length
+
+
 def set_columns_wide(
     df_left: pd.DataFrame,
     df_right: pd.DataFrame,
@@ -181,6 +216,231 @@ def set_columns_wide(
     return df_left
 
 
+def _get_features_positions(columns: pd.MultiIndex, features: Sequence[str]) -> np.ndarray:
+    """Get positions of columns with given features in dataframe in etna wide format.
+
+    Features are matched on the level values, so there is no need to build the full list of column tuples.
+    Positions are returned in the same order as ``df.loc[:, pd.IndexSlice[segments, features]]`` gives:
+    segments in the order of columns, features of each segment in the given order.
+    """
+    feature_level = columns.names.index("feature")
+    segment_level = columns.names.index("segment")
+    features_ranks: Dict[str, int] = {}
+    for rank, feature in enumerate(features):
+        features_ranks.setdefault(feature, rank)
+    # code -1 corresponds to missing value in the level, it shouldn't be selected
+    level_ranks = np.array([features_ranks.get(value, -1) for value in columns.levels[feature_level]] + [-1])
+    columns_ranks = level_ranks[columns.codes[feature_level]]
+    positions = np.flatnonzero(columns_ranks >= 0)
+    segments_order, _ = pd.factorize(columns.codes[segment_level][positions])
+    return positions[np.lexsort((columns_ranks[positions], segments_order))]
+
+
+def _timestamps_to_datetime(timestamps: pd.Series) -> pd.Series:
+    """Convert timestamps to datetime parsing each unique value only once.
+
+    In long dataframes every timestamp is repeated for each segment, but ``pd.to_datetime`` decides whether
+    to cache parsed values by a sample from the beginning of the data, which usually contains unique timestamps
+    of the first segment. So unique values are found explicitly for the object columns.
+    """
+    if timestamps.dtype != object:
+        return pd.to_datetime(timestamps)
+    codes, uniques = pd.factorize(timestamps)
+    if np.any(codes == -1):
+        return pd.to_datetime(timestamps)
+    return pd.Series(pd.to_datetime(uniques).take(codes), index=timestamps.index, name=timestamps.name)
+
+
+def _get_level_unique_values(columns: pd.MultiIndex, level: str) -> List[str]:
+    """Get sorted unique values of the MultiIndex level that are present in the index.
+
+    Values are taken by unique codes of the level, so the values themselves aren't hashed.
+    """
+    level_number = columns.names.index(level)
+    codes = columns.codes[level_number]
+    values = columns.levels[level_number][np.unique(codes[codes != -1])]
+    return sorted(values)
+
+
+def _select_features(df: pd.DataFrame, features: Sequence[str]) -> pd.DataFrame:
+    """Select columns with given features from dataframe in etna wide format."""
+    return df.iloc[:, _get_features_positions(columns=df.columns, features=features)]
+
+
+def _sort_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """Sort columns of dataframe with MultiIndex columns by all the levels.
+
+    It gives the same order as ``df.sort_index(axis=1)``, but columns are sorted by ranks of level values taken by
+    codes, so tuples of values aren't compared. Dataframe is returned as is if its columns are already sorted.
+    """
+    columns = df.columns
+    if columns.is_monotonic_increasing:
+        return df
+    sort_keys = [level.argsort().argsort()[codes] for level, codes in zip(columns.levels, columns.codes)]
+    order = np.lexsort(sort_keys[::-1])
+    return df.iloc[:, order]
+
+
+def _get_first_last_valid_positions(not_na: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Find positions of the first and the last valid values in each column of 2d mask.
+
+    Parameters
+    ----------
+    not_na:
+        boolean mask of shape (n_timestamps, n_columns) with valid values
+
+    Returns
+    -------
+    :
+        positions of first valid values, positions of last valid values, mask of columns with any valid value;
+        positions for the columns without valid values are meaningless
+    """
+    num_rows, num_columns = not_na.shape
+    has_valid = not_na.any(axis=0)
+    if num_rows == 0:
+        return np.zeros(num_columns, dtype=np.int64), np.zeros(num_columns, dtype=np.int64), has_valid
+
+    first_positions = np.argmax(not_na, axis=0)
+    last_positions = num_rows - 1 - np.argmax(not_na[::-1], axis=0)
+    return first_positions, last_positions, has_valid
+
+
+@numba.njit(parallel=True, cache=True)
+def _get_valid_values_stats(values: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Find positions of the first and the last valid values and number of valid values in each column.
+
+    Each column is scanned once, columns are processed in parallel.
+
+    Parameters
+    ----------
+    values:
+        array of shape (n_timestamps, n_columns) with missing values as NaN
+
+    Returns
+    -------
+    :
+        positions of first valid values, positions of last valid values, numbers of valid values;
+        positions for the columns without valid values are -1
+    """
+    num_rows, num_columns = values.shape
+    first_positions = np.full(num_columns, -1, dtype=np.int64)
+    last_positions = np.full(num_columns, -1, dtype=np.int64)
+    num_valid = np.zeros(num_columns, dtype=np.int64)
+    for j in numba.prange(num_columns):
+        first, last, count = -1, -1, 0
+        for i in range(num_rows):
+            if not np.isnan(values[i, j]):
+                if first == -1:
+                    first = i
+                last = i
+                count += 1
+        first_positions[j] = first
+        last_positions[j] = last
+        num_valid[j] = count
+    return first_positions, last_positions, num_valid
+
+
+def _get_valid_timestamps_bounds(index: pd.Index, not_na: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Find the first and the last timestamps with valid values in each column of 2d mask.
+
+    Columns without valid values get ``NaT`` as their bounds.
+    """
+    first_positions, last_positions, has_valid = _get_first_last_valid_positions(not_na)
+    start_timestamps = np.full(not_na.shape[1], np.datetime64("NaT"), dtype="datetime64[ns]")
+    end_timestamps = start_timestamps.copy()
+    timestamps = index.values
+    start_timestamps[has_valid] = timestamps[first_positions[has_valid]]
+    end_timestamps[has_valid] = timestamps[last_positions[has_valid]]
+    return start_timestamps, end_timestamps
+
+
+def _flatten_numeric_features(
+    df: pd.DataFrame, segments: Sequence[str], features: Sequence[str]
+) -> Dict[str, np.ndarray]:
+    """Flatten features with the same numpy numeric dtype in all the segments.
+
+    Features of each dtype are taken from the dataframe by one block and transposed into ``(segment, timestamp)``
+    order at once. It works only if columns of ``df`` are exactly all the pairs of ``segments`` and ``features``
+    in this order, otherwise empty dict is returned.
+
+    Returns
+    -------
+    :
+        mapping from feature name to its flatten values
+    """
+    n_segments, n_features = len(segments), len(features)
+    if not df.columns.equals(pd.MultiIndex.from_product([segments, features])):
+        return {}
+
+    dtypes = df.dtypes.values.reshape(n_segments, n_features)
+    dtype_groups: Dict[np.dtype, List[int]] = {}
+    for i in range(n_features):
+        dtype = dtypes[0, i]
+        is_numeric = isinstance(dtype, np.dtype) and dtype.kind in "biuf"
+        if is_numeric and all(cur_dtype == dtype for cur_dtype in dtypes[:, i]):
+            dtype_groups.setdefault(dtype, []).append(i)
+
+    result = {}
+    for group_positions in dtype_groups.values():
+        n_group = len(group_positions)
+        positions = (np.arange(n_segments)[:, np.newaxis] * n_features + np.array(group_positions)).ravel()
+        values = df.iloc[:, positions].values.reshape(len(df), n_segments, n_group)
+        values = np.ascontiguousarray(values.transpose(2, 1, 0)).reshape(n_group, n_segments * len(df))
+        for j, i in enumerate(group_positions):
+            result[features[i]] = values[j]
+    return result
+
+
+def _flatten_categorical(df: pd.DataFrame) -> pd.Categorical:
+    """Stack categorical columns of dataframe one after another into one categorical.
+
+    If all the columns have the same categories, their codes are concatenated,
+    otherwise categories are united with ``union_categoricals``.
+    """
+    values = [df.iloc[:, i].values for i in range(df.shape[1])]
+    first = values[0]
+    if all(cur.categories.equals(first.categories) and cur.ordered == first.ordered for cur in values[1:]):
+        return pd.Categorical.from_codes(np.concatenate([cur.codes for cur in values]), dtype=first.dtype)
+    return pd.api.types.union_categoricals(values)
+
+
+def _slice_from_first_valid(data: TPandasData) -> TPandasData:
+    """Drop the leading rows without valid values.
+
+    It is an equivalent of ``data.loc[data.first_valid_index():]``, that works with a mask of missing values
+    instead of scanning the rows in python. If there are no valid values, data is returned as is.
+    """
+    not_na = data.notna().values
+    if not_na.ndim == 2:
+        not_na = not_na.any(axis=1)
+    if not not_na.any():
+        return data
+    return data.iloc[np.argmax(not_na) :]
+
+
+@numba.njit(parallel=True, cache=True)
+def _make_windows(values: np.ndarray, window_length: int) -> np.ndarray:
+    """Copy all the windows of consecutive rows of 2d array into preallocated 3d array.
+
+    Parameters
+    ----------
+    values:
+        array of shape (n_timestamps, n_columns)
+    window_length:
+        number of rows in each window
+
+    Returns
+    -------
+    :
+        array of shape (n_windows, window_length, n_columns), where window ``i`` starts from row ``i``
+    """
+    num_windows = max(values.shape[0] - window_length + 1, 0)
+    windows = np.empty((num_windows, window_length, values.shape[1]), dtype=values.dtype)
+    for i in numba.prange(num_windows):
+        windows[i] = values[i : i + window_length]
+    return windows
+
+
 def match_target_quantiles(features: Set[str]) -> Set[str]:
     """Find quantiles in dataframe columns."""
     pattern = re.compile("target_\d+\.\d+$")
@@ -1,4 +1,6 @@
+import pickle
 from contextlib import suppress
+from copy import deepcopy
 from typing import List
 from typing import Tuple
 
@@ -553,6 +555,18 @@ def test_dataset_datetime_conversion_during_init():
     assert ts.df.index.dtype == "datetime64[ns]"
 
 
+@pytest.mark.parametrize("drop_timestamp", [False, True])
+def test_dataset_index_freq_during_init(drop_timestamp):
+    classic_df = generate_ar_df(periods=30, start_time="2021-06-01", n_segments=2)
+    df = TSDataset.to_dataset(classic_df)
+    df.index = pd.DatetimeIndex(list(df.index), name=df.index.name)
+    if drop_timestamp:
+        df = df.drop(index=df.index[10])
+    ts = TSDataset(df, "D")
+    assert ts.df.index.freq == "D"
+    pd.testing.assert_frame_equal(ts.df, df.asfreq("D"))
+
+
 def test_to_dataset_segment_conversion(df_segments_int):
     """Test that `TSDataset.to_dataset` makes casting of segment to string."""
     df = TSDataset.to_dataset(df_segments_int)
@@ -570,6 +584,30 @@ def test_dataset_segment_conversion_during_init(df_segments_int):
     assert np.all(ts.columns.get_level_values("segment") == ["1", "2"])
 
 
+@pytest.mark.parametrize("use_exog", [False, True])
+def test_changes_of_df_not_affect_raw_df_and_input_data(df_and_regressors, use_exog):
+    df, df_exog, known_future = df_and_regressors
+    df_exog = df_exog if use_exog else None
+    df_copy = df.copy(deep=True)
+    ts = TSDataset(df=df, freq="D", df_exog=df_exog)
+    raw_df_copy = ts.raw_df.copy(deep=True)
+    ts.df.loc[:, pd.IndexSlice[:, "target"]] = -1
+    pd.testing.assert_frame_equal(ts.raw_df, raw_df_copy)
+    pd.testing.assert_frame_equal(df, df_copy)
+
+
+@pytest.mark.parametrize("use_exog", [False, True])
+def test_changes_of_input_data_not_affect_raw_df_and_df(df_and_regressors, use_exog):
+    df, df_exog, known_future = df_and_regressors
+    df_exog = df_exog if use_exog else None
+    ts = TSDataset(df=df, freq="D", df_exog=df_exog)
+    raw_df_copy = ts.raw_df.copy(deep=True)
+    df_copy = ts.df.copy(deep=True)
+    df.loc[:, pd.IndexSlice[:, "target"]] = -1
+    pd.testing.assert_frame_equal(ts.raw_df, raw_df_copy)
+    pd.testing.assert_frame_equal(ts.df, df_copy)
+
+
 @pytest.mark.xfail
 def test_make_future_raise_error_on_diff_endings(ts_diff_endings):
     with pytest.raises(ValueError, match="All segments should end at the same timestamp"):
@@ -695,6 +733,23 @@ def test_check_regressors_error(exog_starts_later: bool, exog_ends_earlier: bool
         TSDataset._check_regressors(df=df, df_regressors=df_regressors)
 
 
+def test_check_regressors_error_message_contains_segment(df_and_regressors):
+    """Check that error message points to the segment with not enough regressors history."""
+    df, df_exog, _ = df_and_regressors
+    df_exog = df_exog.copy()
+    df_exog.loc[: pd.Timestamp("2021-01-10"), pd.IndexSlice["2", :]] = np.NaN
+    with pytest.raises(ValueError, match="Series of segment 2 have not enough history"):
+        TSDataset._check_regressors(df=df, df_regressors=df_exog)
+
+
+def test_check_regressors_error_segment_without_regressors(df_and_regressors):
+    """Check that regressors check fails if some segment has no regressors."""
+    df, df_exog, _ = df_and_regressors
+    df_exog = df_exog.drop(columns=["2"], level="segment")
+    with pytest.raises(ValueError, match="Regressors are not present for segment 2!"):
+        TSDataset._check_regressors(df=df, df_regressors=df_exog)
+
+
 def test_check_regressors_pass(df_and_regressors):
     """Check that regressors check on creation passes with correct regressors."""
     df, df_exog, _ = df_and_regressors
@@ -739,6 +794,52 @@ def test_getitem_all_indexes(tsdf_with_exog):
     pd.testing.assert_frame_equal(df_expected, df_slice)
 
 
+def test_segments_updated_after_df_change(tsdf_with_exog):
+    assert tsdf_with_exog.segments == ["Moscow", "Omsk"]
+    tsdf_with_exog.df = tsdf_with_exog.df.drop(columns=["Omsk"], level="segment")
+    assert tsdf_with_exog.segments == ["Moscow"]
+
+
+def test_to_pandas_features_updated_after_df_change(tsdf_with_exog):
+    _ = tsdf_with_exog.to_pandas(features=["target"])
+    tsdf_with_exog.df = tsdf_with_exog.df.drop(columns=["Omsk"], level="segment")
+    df = tsdf_with_exog.to_pandas(features=["target"])
+    assert df.columns.tolist() == [("Moscow", "target")]
+
+
+@pytest.mark.parametrize("features", (["exog", "target"], ["target", "exog"]))
+def test_to_pandas_features_order(tsdf_with_exog, features):
+    df = tsdf_with_exog.to_pandas(features=features)
+    assert df.columns.tolist() == [(segment, feature) for segment in ["Moscow", "Omsk"] for feature in features]
+
+
+@pytest.mark.parametrize("copy_func", (deepcopy, lambda ts: pickle.loads(pickle.dumps(ts))))
+def test_columns_cache_not_copied(tsdf_with_exog, copy_func):
+    _ = tsdf_with_exog.segments
+    ts_copy = copy_func(tsdf_with_exog)
+    assert ts_copy._columns_cache == {}
+    assert ts_copy.segments == tsdf_with_exog.segments
+
+
+def test_columns_cache_not_used_for_other_columns_object(tsdf_with_exog):
+    columns = tsdf_with_exog.df.columns
+    tsdf_with_exog._columns_cache = {id(columns): (columns.copy(), {"segments": ("Tver",)})}
+    assert tsdf_with_exog.segments == ["Moscow", "Omsk"]
+
+
+def test_target_quantiles_names_updated_after_df_change(tsdf_with_exog):
+    assert tsdf_with_exog.target_quantiles_names == ()
+    df_quantile = tsdf_with_exog[:, :, "target"].rename(columns={"target": "target_0.5"}, level="feature")
+    tsdf_with_exog.df = pd.concat((tsdf_with_exog.df, df_quantile), axis=1)
+    assert tsdf_with_exog.target_quantiles_names == ("target_0.5",)
+
+
+def test_segments_not_affected_by_changes_of_returned_list(tsdf_with_exog):
+    segments = tsdf_with_exog.segments
+    segments.append("Tver")
+    assert tsdf_with_exog.segments == ["Moscow", "Omsk"]
+
+
 def test_finding_regressors_marked(df_and_regressors):
     """Check that ts.regressors property works correctly when regressors set."""
     df, df_exog, known_future = df_and_regressors
@@ -883,6 +984,11 @@ def test_gather_common_data(ts_info):
     assert common_data["freq"] == "D"
 
 
+def test_gather_segments_data_unknown_segment_error(ts_info):
+    with pytest.raises(KeyError, match="Column .* is not present in df!"):
+        _ = ts_info._gather_segments_data(["1", "unknown"])
+
+
 def test_gather_segments_data(ts_info):
     """Check that TSDataset._gather_segments_data correctly finds segment data for info/describe methods."""
     segments_dict = ts_info._gather_segments_data(ts_info.segments)
@@ -941,6 +1047,15 @@ def test_to_dataset_not_modify_dataframe():
     pd.testing.assert_frame_equal(df_original, df_copy)
 
 
+def test_to_dataset_not_modify_converted_dataframe():
+    timestamp = pd.date_range("2021-01-01", "2021-02-01")
+    df_original = pd.DataFrame({"timestamp": timestamp, "target": 11.0, "segment": "1"})
+    df_copy = df_original.copy(deep=True)
+    df_mod = TSDataset.to_dataset(df_original)
+    df_mod.loc[:, pd.IndexSlice[:, "target"]] = 0
+    pd.testing.assert_frame_equal(df_original, df_copy)
+
+
 @pytest.mark.parametrize("start_idx,end_idx", [(1, None), (None, 1), (1, 2), (1, -1)])
 def test_tsdataset_idx_slice(tsdf_with_exog, start_idx, end_idx):
     ts_slice = tsdf_with_exog.tsdataset_idx_slice(start_idx=start_idx, end_idx=end_idx)
@@ -987,6 +1102,108 @@ def test_to_torch_dataset_with_drop(tsdf_with_exog):
     )
 
 
+def test_to_torch_dataset_unsorted_columns(tsdf_with_exog):
+    def make_samples(df):
+        return [{"columns": list(df.columns), "exog": df.exog.values}]
+
+    tsdf_with_exog.df = tsdf_with_exog.df.loc[
+        :, [("Moscow", "target"), ("Omsk", "target"), ("Moscow", "exog"), ("Omsk", "exog")]
+    ]
+    torch_dataset = tsdf_with_exog.to_torch_dataset(make_samples)
+    assert len(torch_dataset) == len(tsdf_with_exog.segments)
+    assert torch_dataset[0]["columns"] == ["timestamp", "segment", "target", "exog"]
+    np.testing.assert_array_equal(
+        torch_dataset[1]["exog"], tsdf_with_exog.df.loc[:, pd.IndexSlice["Omsk", "exog"]].values
+    )
+
+
+def test_to_torch_dataset_categories_common_for_segments():
+    def make_samples(df):
+        return [{"categories": list(df["category"].cat.categories), "index": df.index.values}]
+
+    df = generate_ar_df(periods=5, start_time="2020-01-01", n_segments=2)
+    df_exog = df.drop(columns=["target"])
+    df_exog["category"] = np.where(df_exog["segment"] == "segment_0", "a", "b")
+    df_exog = TSDataset.to_dataset(df_exog).astype("category")
+    ts = TSDataset(df=TSDataset.to_dataset(df), df_exog=df_exog, freq="D")
+
+    torch_dataset = ts.to_torch_dataset(make_samples)
+    assert torch_dataset[0]["categories"] == torch_dataset[1]["categories"]
+    np.testing.assert_array_equal(torch_dataset[1]["index"], np.arange(5, 10))
+
+
+def test_to_torch_dataset_float_dtype(tsdf_with_exog):
+    def make_samples(df):
+        return [{"target": df.target.values, "exog": df.exog.values}]
+
+    torch_dataset = tsdf_with_exog.to_torch_dataset(make_samples, float_dtype="float32")
+    assert torch_dataset[0]["target"].dtype == np.float32
+    assert torch_dataset[0]["exog"].dtype == np.float32
+    np.testing.assert_allclose(
+        torch_dataset[0]["target"], tsdf_with_exog.df.loc[:, pd.IndexSlice["Moscow", "target"]].values, rtol=1e-6
+    )
+
+
+@pytest.mark.parametrize("features", ("all", ["exog"]))
+def test_to_torch_dataset_windowed(tsdf_with_exog, features):
+    encoder_length, decoder_length = 5, 2
+    torch_dataset = tsdf_with_exog.to_torch_dataset_windowed(
+        encoder_length=encoder_length, decoder_length=decoder_length, features=features
+    )
+    num_windows = len(tsdf_with_exog.index) - encoder_length - decoder_length + 1
+    assert len(torch_dataset) == num_windows * len(tsdf_with_exog.segments)
+
+    sample = torch_dataset[num_windows + 3]
+    df_omsk = tsdf_with_exog.df.loc[:, "Omsk"].iloc[3 : 3 + encoder_length + decoder_length]
+    assert sample["segment"] == "Omsk"
+    np.testing.assert_allclose(sample["encoder_target"][:, 0], df_omsk["target"].values[:encoder_length], rtol=1e-6)
+    np.testing.assert_allclose(sample["decoder_target"][:, 0], df_omsk["target"].values[encoder_length:], rtol=1e-6)
+    np.testing.assert_allclose(sample["encoder_real"][:, 0], df_omsk["exog"].values[:encoder_length], rtol=1e-6)
+    np.testing.assert_allclose(sample["decoder_real"][:, 0], df_omsk["exog"].values[encoder_length:], rtol=1e-6)
+
+
+def test_to_torch_dataset_windowed_with_drop(tsdf_with_exog):
+    fill_na_idx = tsdf_with_exog.df.index[3]
+    tsdf_with_exog.df.loc[:fill_na_idx, pd.IndexSlice["Moscow", "target"]] = np.nan
+
+    torch_dataset = tsdf_with_exog.to_torch_dataset_windowed(encoder_length=5, decoder_length=2, dropna=True)
+    np.testing.assert_allclose(
+        torch_dataset[0]["encoder_target"][:, 0],
+        tsdf_with_exog.df.loc[fill_na_idx + pd.Timedelta("1 day") :, pd.IndexSlice["Moscow", "target"]].values[:5],
+        rtol=1e-6,
+    )
+
+
+@pytest.fixture
+def ts_with_categorical_exog() -> TSDataset:
+    df = generate_ar_df(periods=10, start_time="2020-01-01", n_segments=2)
+    df_exog = df.drop(columns=["target"])
+    df_exog["exog"] = 1.0
+    df_exog["category"] = np.where(df_exog["segment"] == "segment_0", "a", "b")
+    df_exog = TSDataset.to_dataset(df_exog)
+    df_exog = df_exog.astype({column: "category" for column in df_exog.columns if column[1] == "category"})
+    ts = TSDataset(df=TSDataset.to_dataset(df), df_exog=df_exog, freq="D")
+    return ts
+
+
+def test_to_torch_dataset_windowed_all_features_skip_non_numeric(ts_with_categorical_exog):
+    torch_dataset = ts_with_categorical_exog.to_torch_dataset_windowed(encoder_length=3, decoder_length=2)
+    assert torch_dataset[0]["encoder_real"].shape == (3, 1)
+    np.testing.assert_array_equal(torch_dataset[0]["encoder_real"][:, 0], np.ones(3))
+
+
+def test_to_torch_dataset_windowed_fail_non_numeric_features(ts_with_categorical_exog):
+    with pytest.raises(ValueError, match="aren't numeric!"):
+        _ = ts_with_categorical_exog.to_torch_dataset_windowed(
+            encoder_length=3, decoder_length=2, features=["exog", "category"]
+        )
+
+
+def test_to_torch_dataset_windowed_fail_target_in_features(tsdf_with_exog):
+    with pytest.raises(ValueError, match="Target is always used and shouldn't be passed in features!"):
+        _ = tsdf_with_exog.to_torch_dataset_windowed(encoder_length=5, decoder_length=2, features=["target"])
+
+
 def test_add_columns_from_pandas_update_df(df_and_regressors, df_update_add_column, df_updated_add_column):
     df, _, _ = df_and_regressors
     ts = TSDataset(df=df, freq="D")
@@ -1024,6 +1241,17 @@ def test_update_columns_from_pandas(df_and_regressors, df_update_update_column,
     pd.testing.assert_frame_equal(ts.df, df_updated_update_column)
 
 
+def test_update_columns_from_pandas_same_dtypes(df_and_regressors, df_update_update_column):
+    df, df_exog, known_future = df_and_regressors
+    ts = TSDataset(df=df, freq="D", df_exog=df_exog, known_future=known_future)
+    df_update = df_update_update_column.astype(float)
+    expected_df = ts.df.copy()
+    expected_df.loc[:, pd.IndexSlice[:, "target"]] = df_update.loc[: ts.df.index.max()].values
+
+    ts.update_columns_from_pandas(df_update=df_update)
+    pd.testing.assert_frame_equal(ts.df, expected_df)
+
+
 @pytest.mark.filterwarnings("ignore: Features {'out_of_dataset_column'} are not present in")
 @pytest.mark.parametrize(
     "features, drop_from_exog, df_expected_columns, df_exog_expected_columns",
@@ -1057,6 +1285,15 @@ def test_drop_features(df_and_regressors, features, drop_from_exog, df_expected_
     assert sorted(df_exog_columns) == sorted(df_exog_expected_columns)
 
 
+def test_drop_features_from_exog_not_affect_future_dataset(df_and_regressors):
+    df, df_exog, known_future = df_and_regressors
+    ts = TSDataset(df=df, df_exog=df_exog, freq="D", known_future=known_future)
+    future_ts = ts.make_future(future_steps=3)
+    ts.drop_features(features=["regressor_1"], drop_from_exog=True)
+    assert "regressor_1" in future_ts.df_exog.columns.get_level_values("feature")
+    assert "regressor_1" not in ts.df_exog.columns.get_level_values("feature")
+
+
 def test_drop_features_raise_warning_on_unknown_columns(
     df_and_regressors, features=["regressor_2", "out_of_dataset_column"]
 ):
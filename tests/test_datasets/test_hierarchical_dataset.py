@@ -362,6 +362,33 @@ def test_to_hierarchical_dataset_correct_dataframe(product_level_df_long, produc
     pd.testing.assert_frame_equal(df_wide_obtained, product_level_df_wide)
 
 
+def test_to_hierarchical_dataset_level_structure(product_level_df_long):
+    df = product_level_df_long.iloc[::-1]
+    _, hs = TSDataset.to_hierarchical_dataset(df=df, level_columns=["market", "product"], return_hierarchy=True)
+    assert hs.level_structure == {"total": ["Y", "X"], "Y": ["Y_d", "Y_c"], "X": ["X_b", "X_a"]}
+
+
+@pytest.mark.parametrize("return_hierarchy", (True, False))
+def test_to_hierarchical_dataset_fail_missing_values_in_level_columns(product_level_df_long, return_hierarchy):
+    df = product_level_df_long.copy()
+    df.loc[df.index[0], "market"] = None
+    with pytest.raises(ValueError, match="Level columns shouldn't contain missing values!"):
+        _ = TSDataset.to_hierarchical_dataset(
+            df=df, level_columns=["market", "product"], return_hierarchy=return_hierarchy
+        )
+
+
+def test_hierarchical_structure_from_level_columns_fail_missing_values():
+    level_columns_segments = [
+        pd.Series([None, "x", "y"], dtype="string"),
+        pd.Series([None, "x_q", "y_r"], dtype="string"),
+    ]
+    with pytest.raises(ValueError, match="Level columns shouldn't contain missing values!"):
+        _ = TSDataset._hierarchical_structure_from_level_columns(
+            level_columns_segments=level_columns_segments, level_columns=["a", "b"]
+        )
+
+
 def test_to_hierarchical_dataset_hierarchical_structure(
     level_columns_different_types_df, hierarchical_structure_complex
 ):
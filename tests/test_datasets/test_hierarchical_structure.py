@@ -1,5 +1,6 @@
 from typing import Dict
 from typing import List
+from typing import Set
 
 import numpy as np
 import pytest
@@ -261,6 +262,21 @@ def test_segments_level(simple_hierarchical_structure: HierarchicalStructure, se
     assert simple_hierarchical_structure.get_segment_level(segment) == answer
 
 
+@pytest.mark.parametrize(
+    "segments,answer",
+    ((["total"], {"l1"}), (["X", "Y"], {"l2"}), (["X", "c", "d"], {"l2", "l3"}), ([], set())),
+)
+def test_get_segments_levels(
+    simple_hierarchical_structure: HierarchicalStructure, segments: List[str], answer: Set[str]
+):
+    assert simple_hierarchical_structure.get_segments_levels(segments=segments) == answer
+
+
+def test_get_segments_levels_unknown_segment_error(simple_hierarchical_structure: HierarchicalStructure):
+    with pytest.raises(ValueError, match="Segment e is out of the hierarchy"):
+        simple_hierarchical_structure.get_segments_levels(segments=["a", "e"])
+
+
 @pytest.mark.parametrize(
     "target_level,answer",
     (("l2", 1), ("l3", 2), ("l1", 0)),
@@ -5,6 +5,18 @@ import pytest
 from etna.datasets import TSDataset
 from etna.datasets import duplicate_data
 from etna.datasets import generate_ar_df
+from etna.datasets.utils import _flatten_categorical
+from etna.datasets.utils import _flatten_numeric_features
+from etna.datasets.utils import _get_first_last_valid_positions
+from etna.datasets.utils import _get_level_unique_values
+from etna.datasets.utils import _get_valid_timestamps_bounds
+from etna.datasets.utils import _get_valid_values_stats
+from etna.datasets.utils import _make_windows
+from etna.datasets.utils import _select_features
+from etna.datasets.utils import _slice_from_first_valid
+from etna.datasets.utils import _sort_columns
+from etna.datasets.utils import _timestamps_to_datetime
+from etna.datasets.utils import _TorchArraysDataset
 from etna.datasets.utils import _TorchDataset
 from etna.datasets.utils import get_level_dataframe
 from etna.datasets.utils import get_target_with_quantiles
@@ -76,6 +88,22 @@ def test_torch_dataset():
     assert len(torch_dataset) == 1
 
 
+def test_torch_arrays_dataset():
+    """Unit test for `_TorchArraysDataset` class."""
+    arrays = {"decoder_target": np.arange(6).reshape(2, 3), "segment": np.array(["a", "b"], dtype=object)}
+
+    torch_dataset = _TorchArraysDataset(arrays=arrays)
+
+    np.testing.assert_array_equal(torch_dataset[1]["decoder_target"], np.array([3, 4, 5]))
+    assert torch_dataset[1]["segment"] == "b"
+    assert len(torch_dataset) == 2
+
+
+def test_torch_arrays_dataset_fail_different_lengths():
+    with pytest.raises(ValueError, match="All the arrays should have the same length!"):
+        _ = _TorchArraysDataset(arrays={"decoder_target": np.zeros((2, 3)), "segment": np.array(["a"])})
+
+
 def _get_df_wide(random_seed: int) -> pd.DataFrame:
     df = generate_ar_df(periods=5, start_time="2020-01-01", n_segments=3, random_seed=random_seed)
     df_wide = TSDataset.to_dataset(df)
@@ -331,3 +359,189 @@ def test_inverse_transform_target_components(
         inverse_transformed_target_df=inverse_transformed_target_df,
     )
     pd.testing.assert_frame_equal(obtained_inverse_transformed_components_df, inverse_transformed_components_df)
+
+
+@pytest.mark.parametrize(
+    "features, expected_features",
+    (
+        (["target"], ["target"]),
+        (["exog_2", "target"], ["exog_2", "target"]),
+        (["target", "exog_1", "exog_2"], ["target", "exog_1", "exog_2"]),
+        (["target", "unknown_feature"], ["target"]),
+    ),
+)
+def test_select_features(features, expected_features):
+    df = generate_ar_df(periods=10, start_time="2020-01-01", n_segments=3)
+    df["exog_1"] = 1
+    df["exog_2"] = 2
+    df_wide = TSDataset.to_dataset(df)
+
+    df_selected = _select_features(df=df_wide, features=features)
+
+    expected_columns = pd.MultiIndex.from_product(
+        [["segment_0", "segment_1", "segment_2"], expected_features], names=["segment", "feature"]
+    )
+    pd.testing.assert_index_equal(df_selected.columns, expected_columns)
+    pd.testing.assert_frame_equal(df_selected, df_wide.loc[:, expected_columns])
+
+
+def test_get_first_last_valid_positions():
+    not_na = np.array([[False, True, False], [True, True, False], [True, False, False], [False, False, False]])
+
+    first_positions, last_positions, has_valid = _get_first_last_valid_positions(not_na)
+
+    np.testing.assert_array_equal(first_positions[has_valid], [1, 0])
+    np.testing.assert_array_equal(last_positions[has_valid], [2, 1])
+    np.testing.assert_array_equal(has_valid, [True, True, False])
+
+
+def test_get_valid_timestamps_bounds():
+    index = pd.date_range("2020-01-01", periods=4, freq="D")
+    not_na = np.array([[False, True, False], [True, True, False], [True, False, False], [False, False, False]])
+
+    start_timestamps, end_timestamps = _get_valid_timestamps_bounds(index=index, not_na=not_na)
+
+    expected_start = pd.to_datetime(["2020-01-02", "2020-01-01", None]).values
+    expected_end = pd.to_datetime(["2020-01-03", "2020-01-02", None]).values
+    np.testing.assert_array_equal(start_timestamps, expected_start)
+    np.testing.assert_array_equal(end_timestamps, expected_end)
+
+
+@pytest.mark.parametrize(
+    "data",
+    (
+        pd.Series([np.NaN, np.NaN, 1, np.NaN, 2], index=pd.date_range("2020-01-01", periods=5)),
+        pd.Series([1, np.NaN, 2], index=pd.date_range("2020-01-01", periods=3)),
+        pd.Series([np.NaN, np.NaN], index=pd.date_range("2020-01-01", periods=2)),
+        pd.DataFrame(
+            {"a": [np.NaN, np.NaN, 1, 2], "b": [np.NaN, 3, np.NaN, 4]}, index=pd.date_range("2020-01-01", periods=4)
+        ),
+        pd.DataFrame({"a": [np.NaN, np.NaN], "b": [np.NaN, np.NaN]}, index=pd.date_range("2020-01-01", periods=2)),
+    ),
+)
+def test_slice_from_first_valid(data):
+    expected = data.loc[data.first_valid_index() :]
+    result = _slice_from_first_valid(data)
+    if isinstance(data, pd.Series):
+        pd.testing.assert_series_equal(result, expected)
+    else:
+        pd.testing.assert_frame_equal(result, expected)
+
+
+def test_flatten_numeric_features():
+    df = pd.DataFrame(
+        {
+            ("a", "feature_1"): [1, 2],
+            ("a", "feature_2"): [0.5, 1.5],
+            ("a", "feature_3"): ["x", "y"],
+            ("b", "feature_1"): [3, 4],
+            ("b", "feature_2"): [2.5, 3.5],
+            ("b", "feature_3"): ["z", "w"],
+        }
+    )
+    result = _flatten_numeric_features(df=df, segments=["a", "b"], features=["feature_1", "feature_2", "feature_3"])
+    assert set(result.keys()) == {"feature_1", "feature_2"}
+    np.testing.assert_array_equal(result["feature_1"], np.array([1, 2, 3, 4]))
+    np.testing.assert_array_equal(result["feature_2"], np.array([0.5, 1.5, 2.5, 3.5]))
+
+
+def test_flatten_numeric_features_different_dtypes_in_segments():
+    df = pd.DataFrame({("a", "feature_1"): [1, 2], ("b", "feature_1"): [0.5, 1.5]})
+    result = _flatten_numeric_features(df=df, segments=["a", "b"], features=["feature_1"])
+    assert result == {}
+
+
+def test_flatten_numeric_features_not_all_features_in_segments():
+    df = pd.DataFrame({("a", "feature_1"): [1, 2], ("a", "feature_2"): [1, 2], ("b", "feature_1"): [3, 4]})
+    result = _flatten_numeric_features(df=df, segments=["a", "b"], features=["feature_1", "feature_2"])
+    assert result == {}
+
+
+@pytest.mark.parametrize(
+    "columns",
+    (
+        [("b", "target"), ("a", "target"), ("b", "exog"), ("a", "exog")],
+        [("a", "exog"), ("a", "target"), ("b", "exog"), ("b", "target")],
+        [("10", "target"), ("9", "target"), ("10", "exog"), ("9", "exog")],
+    ),
+)
+def test_sort_columns(columns):
+    df = pd.DataFrame(np.arange(2 * len(columns)).reshape(2, -1), columns=pd.MultiIndex.from_tuples(columns))
+    pd.testing.assert_frame_equal(_sort_columns(df), df.sort_index(axis=1))
+
+
+def test_sort_columns_unsorted_levels():
+    columns = pd.MultiIndex.from_tuples([(10, "target"), (9, "target"), (10, "exog"), (9, "exog")])
+    columns = columns.set_levels(columns.levels[0].astype(str), level=0)
+    df = pd.DataFrame(np.arange(8).reshape(2, -1), columns=columns)
+    pd.testing.assert_frame_equal(_sort_columns(df), df.sort_index(axis=1))
+
+
+@pytest.mark.parametrize(
+    "categories_1, categories_2, ordered",
+    (
+        (["a", "b", "c"], ["a", "b", "c"], False),
+        (["a", "b", "c"], ["a", "b", "c"], True),
+        (["a", "b", "c"], ["c", "b", "a"], False),
+        (["a", "b", "c"], ["b", "c", "d"], False),
+    ),
+)
+def test_flatten_categorical(categories_1, categories_2, ordered):
+    df = pd.DataFrame(
+        {
+            ("1", "feature"): pd.Categorical(["a", "b", None], categories=categories_1, ordered=ordered),
+            ("2", "feature"): pd.Categorical(["c", "b", "b"], categories=categories_2, ordered=ordered),
+        }
+    )
+    expected = pd.api.types.union_categoricals([df[column] for column in df.columns])
+    result = _flatten_categorical(df)
+    pd.testing.assert_extension_array_equal(result, expected)
+
+
+@pytest.mark.parametrize(
+    "values, expected_first, expected_last, expected_num_valid",
+    (
+        (
+            np.array([[np.NaN, 1, np.NaN], [2, np.NaN, np.NaN], [np.NaN, 3, np.NaN], [4, np.NaN, np.NaN]]),
+            [1, 0, -1],
+            [3, 2, -1],
+            [2, 2, 0],
+        ),
+        (np.empty((0, 2)), [-1, -1], [-1, -1], [0, 0]),
+    ),
+)
+def test_get_valid_values_stats(values, expected_first, expected_last, expected_num_valid):
+    first, last, num_valid = _get_valid_values_stats(values)
+    np.testing.assert_array_equal(first, expected_first)
+    np.testing.assert_array_equal(last, expected_last)
+    np.testing.assert_array_equal(num_valid, expected_num_valid)
+
+
+def test_get_level_unique_values():
+    columns = pd.MultiIndex.from_tuples(
+        [("b", "target"), ("b", "exog"), ("a", "target")], names=["segment", "feature"]
+    ).set_levels(["b", "a", "c"], level="segment")
+    assert _get_level_unique_values(columns=columns, level="segment") == ["a", "b"]
+    assert _get_level_unique_values(columns=columns, level="feature") == ["exog", "target"]
+
+
+@pytest.mark.parametrize(
+    "timestamps",
+    (
+        pd.Series(["2020-01-01", "2020-01-02", "2020-01-01", "2020-01-02"], index=[3, 2, 1, 0], name="timestamp"),
+        pd.Series(["2020-01-01", None, "2020-01-01"], name="timestamp"),
+        pd.Series(pd.date_range("2020-01-01", periods=3).astype(str), name="timestamp"),
+        pd.Series(pd.date_range("2020-01-01", periods=3), name="timestamp"),
+    ),
+)
+def test_timestamps_to_datetime(timestamps):
+    pd.testing.assert_series_equal(_timestamps_to_datetime(timestamps), pd.to_datetime(timestamps))
+
+
+@pytest.mark.parametrize("window_length", (1, 3, 5, 6))
+def test_make_windows(window_length):
+    values = np.arange(10, dtype=np.float32).reshape(5, 2)
+    windows = _make_windows(values, window_length)
+    expected = np.array([values[i : i + window_length] for i in range(len(values) - window_length + 1)])
+    assert windows.shape == (max(len(values) - window_length + 1, 0), window_length, 2)
+    np.testing.assert_array_equal(windows.reshape(-1, window_length, 2), expected.reshape(-1, window_length, 2))